@@ -0,0 +1,228 @@
+"""Module for exporting the stop graph and congestion values to vector map files."""
+import html
+import json
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+COORDINATE_PRECISION = 6
+VALUE_PRECISION = 6
+
+STOP_PROPERTIES = ['stop_id', 'name']
+
+MAP_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>
+html, body, #map {height: 100%; margin: 0;}
+#layer-select {position: absolute; top: 10px; right: 10px; z-index: 1000; padding: 4px;}
+</style>
+</head>
+<body>
+<div id="map"></div>
+<select id="layer-select"></select>
+<script>
+const stops = $stops;
+const edges = $edges;
+const congestion = $congestion;
+
+const map = L.map("map", {preferCanvas: true});
+const edgeLayer = L.geoJSON(edges, {style: {color: "#888888", weight: 1, opacity: 0.6}}).addTo(map);
+const markers = stops.features.map(feature => L.circleMarker(
+    [feature.geometry.coordinates[1], feature.geometry.coordinates[0]],
+    {radius: 3, weight: 0, fillOpacity: 0.9}
+).bindTooltip(feature.properties.name).addTo(map));
+map.fitBounds(edgeLayer.getBounds());
+
+function quantile(sorted, q) {
+    return sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+}
+
+function showLayer(name) {
+    const values = congestion.layers[name];
+    const sorted = values.filter(value => value !== null).sort((a, b) => a - b);
+    const low = quantile(sorted, 0.05), high = quantile(sorted, 0.95);
+    markers.forEach((marker, i) => {
+        const value = values[i];
+        if (value === null) {
+            marker.setStyle({fillColor: "#cccccc", fillOpacity: 0.3});
+            return;
+        }
+        const scaled = high > low ? Math.min(1, Math.max(0, (value - low) / (high - low))) : 0;
+        marker.setStyle({fillColor: `hsl(${120 * (1 - scaled)}, 90%, 45%)`, fillOpacity: 0.9});
+    });
+}
+
+const select = document.getElementById("layer-select");
+Object.keys(congestion.layers).forEach(name => select.add(new Option(name, name)));
+select.addEventListener("change", event => showLayer(event.target.value));
+if (select.options.length) {
+    showLayer(select.value);
+}
+</script>
+</body>
+</html>
+"""
+
+
+def graph_to_frames(graph: nx.Graph) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Extracts the stops and the edges of a stop graph together with their coordinates.
+
+    :arg
+        graph (nx.Graph): a graph built with build_stop_graph, whose nodes have name, latitude, and longitude.
+
+    :return
+        (pd.DataFrame, pd.DataFrame) a dataframe with a row per stop and a dataframe with a row per edge.
+    """
+    nodes = pd.DataFrame({
+        'stop_id': list(graph.nodes),
+        'name': [name for _, name in graph.nodes(data='name')],
+        'latitude': np.fromiter((lat for _, lat in graph.nodes(data='latitude')), dtype=float,
+                                count=graph.number_of_nodes()),
+        'longitude': np.fromiter((lon for _, lon in graph.nodes(data='longitude')), dtype=float,
+                                 count=graph.number_of_nodes()),
+    })
+
+    stop_index = pd.Index(nodes['stop_id'])
+    source = stop_index.get_indexer([u for u, _ in graph.edges])
+    target = stop_index.get_indexer([v for _, v in graph.edges])
+
+    edges = pd.DataFrame({
+        'source': nodes['stop_id'].to_numpy()[source],
+        'target': nodes['stop_id'].to_numpy()[target],
+        'source_latitude': nodes['latitude'].to_numpy()[source],
+        'source_longitude': nodes['longitude'].to_numpy()[source],
+        'target_latitude': nodes['latitude'].to_numpy()[target],
+        'target_longitude': nodes['longitude'].to_numpy()[target],
+    })
+
+    return nodes, edges
+
+
+def stops_to_geojson(nodes: pd.DataFrame, layers: Optional[Dict[str, pd.Series]] = None) -> dict:
+    """Builds a GeoJSON feature collection of points from the stops.
+
+    :arg
+        nodes (pd.DataFrame): the stops, as returned by graph_to_frames.
+        layers (Dict[str, pd.Series]): optional congestion values indexed by stop id, added as properties named after
+        the dictionary keys, which must differ from stop_id and name. Prefer congestion_layers when exporting many
+        layers, since it does not repeat the stops.
+
+    :return
+        (dict) a GeoJSON feature collection.
+    """
+    coordinates = np.round(nodes[['longitude', 'latitude']].to_numpy(), COORDINATE_PRECISION).tolist()
+    properties = nodes[STOP_PROPERTIES]
+
+    if layers:
+        reserved = [name for name in layers if name in STOP_PROPERTIES]
+        if reserved:
+            raise ValueError(f"Layer names {reserved} would overwrite the stop properties {STOP_PROPERTIES}.")
+
+        values = congestion_layers(nodes, layers)['layers']
+        properties = properties.assign(**values)
+
+    properties = properties.astype(object).where(properties.notna(), None).to_dict('records')
+
+    return {
+        'type': 'FeatureCollection',
+        'features': [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': point}, 'properties': props}
+                     for point, props in zip(coordinates, properties)],
+    }
+
+
+def edges_to_geojson(edges: pd.DataFrame) -> dict:
+    """Builds a GeoJSON feature collection of line strings from the edges.
+
+    :arg
+        edges (pd.DataFrame): the edges, as returned by graph_to_frames.
+
+    :return
+        (dict) a GeoJSON feature collection.
+    """
+    lines = np.stack([edges[['source_longitude', 'source_latitude']].to_numpy(),
+                      edges[['target_longitude', 'target_latitude']].to_numpy()], axis=1)
+    lines = np.round(lines, COORDINATE_PRECISION).tolist()
+
+    return {
+        'type': 'FeatureCollection',
+        'features': [{'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': line},
+                      'properties': {'source': source, 'target': target}}
+                     for line, source, target in zip(lines, edges['source'].tolist(), edges['target'].tolist())],
+    }
+
+
+def congestion_layers(nodes: pd.DataFrame, layers: Dict[str, pd.Series]) -> dict:
+    """Aligns congestion values of many conditions to the order of the stops.
+
+    Each layer is a list with a value per stop in the order of the stop features, so all layers share the same
+    geometry. Stops without a value in a layer, e.g. removed by vertex_signal for the condition, are null.
+
+    :arg
+        nodes (pd.DataFrame): the stops, as returned by graph_to_frames.
+        layers (Dict[str, pd.Series]): congestion values indexed by stop id, one series per condition, e.g.
+        {"day_0_lambda_8": congestion}.
+
+    :return
+        (dict) a dictionary with the stop ids and the values of every layer.
+    """
+    stop_ids = nodes['stop_id']
+    aligned = {}
+
+    for name, values in layers.items():
+        values = values.reindex(stop_ids).to_numpy(dtype=float)
+        values = np.round(values, VALUE_PRECISION).astype(object)
+        values[pd.isna(values)] = None
+        aligned[name] = values.tolist()
+
+    return {'stop_id': stop_ids.tolist(), 'layers': aligned}
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+
+def _script_safe(data: str) -> str:
+    """Escapes JSON so that it can be embedded in a script tag, e.g. a stop name with </script> does not end it."""
+    return data.replace("</", "<\\/")
+
+
+def export_map(graph: nx.Graph, layers: Dict[str, pd.Series], directory: str, title: str = "ATAC congestion"):
+    """Exports the stop graph and congestion layers as GeoJSON files and a single html map.
+
+    The directory will contain stops.geojson, edges.geojson, congestion.json with the values of all layers aligned to
+    the stops, and map.html, which embeds the geometry once and switches between layers by restyling the stops.
+
+    :arg
+        graph (nx.Graph): a graph built with build_stop_graph.
+        layers (Dict[str, pd.Series]): congestion values indexed by stop id, one series per condition.
+        directory (str): the directory where the files will be saved.
+        title (str): the title of the html map.
+    """
+    nodes, edges = graph_to_frames(graph)
+
+    stops = _dumps(stops_to_geojson(nodes))
+    lines = _dumps(edges_to_geojson(edges))
+    congestion = _dumps(congestion_layers(nodes, layers))
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+
+    for file_name, content in [("stops.geojson", stops), ("edges.geojson", lines), ("congestion.json", congestion)]:
+        with open(f"{directory}/{file_name}", "w") as file:
+            file.write(content)
+
+    # all placeholders are substituted in one pass, so placeholders inside the inserted data are left alone
+    values = {'title': html.escape(title), 'stops': _script_safe(stops), 'edges': _script_safe(lines),
+              'congestion': _script_safe(congestion)}
+    map_html = re.sub(r"\$(title|stops|edges|congestion)\b", lambda match: values[match.group(1)], MAP_TEMPLATE)
+
+    with open(f"{directory}/map.html", "w") as file:
+        file.write(map_html)
@@ -2,6 +2,7 @@
 from typing import Union
 
 import networkx as nx
+import numpy as np
 import pandas as pd
 
 
@@ -108,3 +109,73 @@ def get_start_end_hours(start_hour: int, interval: int = 60):
     end_minutes = end_minutes % 60
 
     return f"{start_hour:02}:00", f"{end_hour:02}:{end_minutes:02}"
+
+
+def to_minute_of_day(time: Union[str, pd.Timestamp]) -> float:
+    """Converts a time of day to the (fractional) number of minutes since midnight.
+
+    :arg
+        time (Union[str, pd.Timestamp]): a string in the format HH:MM (or anything pandas can parse) or a timestamp.
+
+    :return
+        (float) the minutes since midnight, seconds and microseconds included as fractions of a minute.
+    """
+    time = pd.to_datetime(time).time()
+    return time.hour * 60 + time.minute + time.second / 60 + time.microsecond / 60_000_000
+
+
+class TimeIndex:
+    """Index over the observations of a dataframe sorted by minute of day.
+
+    Building the index sorts the observations once, afterward each time window is selected with two binary searches
+    and a slice instead of a full scan of the dataframe. Windows where the start is after the end, e.g. 23:00 - 00:00,
+    wrap around midnight.
+    """
+
+    def __init__(self, data: pd.DataFrame, column: str = 'time_pre_datetime'):
+        """
+        :arg
+            data (pd.DataFrame): the dataframe with the observations.
+            column (str): the datetime column used to compute the minute of day.
+        """
+        times = data[column].dt
+        minutes = (times.hour * 60 + times.minute + times.second / 60 + times.microsecond / 60_000_000).to_numpy()
+
+        # observations without a time (NaT) never match a time window
+        valid = np.flatnonzero(np.isfinite(minutes))
+        order = valid[np.argsort(minutes[valid], kind='stable')]
+        self.minutes = minutes[order]
+        self.data = data.iloc[order]
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def _positions(self, start: float, end: float) -> list[tuple[int, int]]:
+        """Returns the [low, high) position ranges in the sorted observations for a window with inclusive bounds."""
+        if start <= end:
+            return [(np.searchsorted(self.minutes, start, side='left'),
+                     np.searchsorted(self.minutes, end, side='right'))]
+
+        # the window wraps around midnight, so we take the end of the day and the beginning of the next one
+        return [(np.searchsorted(self.minutes, start, side='left'), len(self.minutes)),
+                (0, np.searchsorted(self.minutes, end, side='right'))]
+
+    def count(self, start: Union[str, pd.Timestamp], end: Union[str, pd.Timestamp]) -> int:
+        """Returns the number of observations in the time window [start, end]."""
+        return sum(high - low for low, high in self._positions(to_minute_of_day(start), to_minute_of_day(end)))
+
+    def select(self, start: Union[str, pd.Timestamp], end: Union[str, pd.Timestamp]) -> pd.DataFrame:
+        """Selects the observations in the time window [start, end].
+
+        :arg
+            start (Union[str, pd.Timestamp]): the start of the window, e.g. "08:00", inclusive.
+            end (Union[str, pd.Timestamp]): the end of the window, e.g. "09:00", inclusive. If it is before the start,
+            the window wraps around midnight.
+
+        :return
+            (pd.DataFrame) the observations in the window, sorted by minute of day.
+        """
+        slices = [self.data.iloc[low:high] for low, high in
+                  self._positions(to_minute_of_day(start), to_minute_of_day(end))]
+
+        return slices[0] if len(slices) == 1 else pd.concat(slices)
@@ -0,0 +1,90 @@
+"""Unit tests for the map export."""
+import json
+import os
+import shutil
+
+import networkx as nx
+import pandas as pd
+import pytest
+
+from export import graph_to_frames, stops_to_geojson, edges_to_geojson, congestion_layers, export_map
+
+
+@pytest.fixture
+def stop_graph():
+    graph = nx.Graph()
+    graph.add_node("A", name="Termini", latitude=41.901, longitude=12.501)
+    graph.add_node("B", name="Colosseo", latitude=41.890, longitude=12.492)
+    graph.add_node("C", name="Piramide", latitude=41.876, longitude=12.481)
+    graph.add_edges_from([("A", "B"), ("B", "C")])
+    return graph
+
+
+@pytest.fixture
+def cleanup_file_after_test():
+    yield
+    file_path = "tmp/"
+    if os.path.exists(file_path):
+        shutil.rmtree(file_path)
+
+
+def test_graph_to_geojson(stop_graph):
+    nodes, edges = graph_to_frames(stop_graph)
+
+    stops = stops_to_geojson(nodes)
+    lines = edges_to_geojson(edges)
+
+    assert [feature['properties']['stop_id'] for feature in stops['features']] == ["A", "B", "C"]
+    assert stops['features'][0]['geometry']['coordinates'] == [12.501, 41.901]
+    assert lines['features'][1]['geometry']['coordinates'] == [[12.492, 41.890], [12.481, 41.876]]
+    assert lines['features'][1]['properties'] == {'source': "B", 'target': "C"}
+
+
+def test_congestion_layers_aligned_to_stops(stop_graph):
+    nodes, _ = graph_to_frames(stop_graph)
+    layers = {"day_0_lambda_1": pd.Series({"C": 3.0, "A": 1.0}), "day_1_lambda_1": pd.Series({"B": 2.0})}
+
+    congestion = congestion_layers(nodes, layers)
+
+    assert congestion['stop_id'] == ["A", "B", "C"]
+    assert congestion['layers'] == {"day_0_lambda_1": [1.0, None, 3.0], "day_1_lambda_1": [None, 2.0, None]}
+
+
+def test_export_map(stop_graph, cleanup_file_after_test):
+    export_map(stop_graph, {"weather_0_lambda_8": pd.Series({"A": 0.5})}, "tmp/map")
+
+    for file_name in ["stops.geojson", "edges.geojson", "congestion.json", "map.html"]:
+        assert os.path.exists(f"tmp/map/{file_name}")
+
+    with open("tmp/map/congestion.json", "r") as file:
+        assert json.load(file)['layers'] == {"weather_0_lambda_8": [0.5, None, None]}
+
+
+def test_stops_to_geojson_rejects_stop_property_layers(stop_graph):
+    nodes, _ = graph_to_frames(stop_graph)
+
+    with pytest.raises(ValueError):
+        stops_to_geojson(nodes, {"name": pd.Series({"A": 1.0})})
+
+
+def test_export_map_escapes_html(stop_graph, cleanup_file_after_test):
+    stop_graph.nodes["A"]["name"] = "</script><b>Termini</b>"
+    export_map(stop_graph, {}, "tmp/map", title="<Rome & ATAC>")
+
+    with open("tmp/map/map.html", "r") as file:
+        map_html = file.read()
+
+    assert "<title>&lt;Rome &amp; ATAC&gt;</title>" in map_html
+    assert map_html.count("</script>") == 2
+
+
+def test_export_map_keeps_placeholders_in_data(stop_graph, cleanup_file_after_test):
+    stop_graph.nodes["A"]["name"] = "$edges"
+    export_map(stop_graph, {"day_0_lambda_1": pd.Series({"A": 1.0})}, "tmp/map", title="$congestion")
+
+    with open("tmp/map/map.html", "r") as file:
+        map_html = file.read()
+
+    assert "<title>$congestion</title>" in map_html
+    assert '"name":"$edges"' in map_html
+    assert map_html.count('"type":"FeatureCollection"') == 2
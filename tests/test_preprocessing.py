@@ -1,6 +1,8 @@
 """Unit tests for preprocessing."""
 
-from preprocessing import get_start_end_hours
+import pandas as pd
+
+from preprocessing import get_start_end_hours, TimeIndex
 
 
 def test_get_start_end_hours_with_hour_interval():
@@ -37,3 +39,42 @@ def test_get_start_end_hours_midnight():
 
     assert actual_start == expected_start
     assert actual_end == expected_end
+
+
+def _time_df():
+    times = ["2023-06-01 08:30:00", "2023-06-01 23:15:00", "2023-06-02 00:00:00", "2023-06-02 09:00:00",
+             "2023-06-02 09:00:30", "2023-06-02 00:45:00", "2023-06-03 08:00:00", None]
+    return pd.DataFrame({"time_pre_datetime": pd.to_datetime(times).tz_localize("Europe/Rome"),
+                         "elapsed": range(len(times))})
+
+
+def test_time_index_select_matches_time_comparison():
+    df = _time_df()
+    time_index = TimeIndex(df)
+    start, end = get_start_end_hours(8)
+
+    start_time, end_time = pd.to_datetime(start).time(), pd.to_datetime(end).time()
+    expected = df[(df.time_pre_datetime.dt.time >= start_time) & (df.time_pre_datetime.dt.time <= end_time)]
+
+    actual = time_index.select(start, end)
+
+    assert sorted(actual.elapsed) == sorted(expected.elapsed) == [0, 3, 6]
+    assert time_index.count(start, end) == 3
+
+
+def test_time_index_select_across_midnight():
+    time_index = TimeIndex(_time_df())
+    start, end = get_start_end_hours(23)
+
+    actual = time_index.select(start, end)
+
+    assert sorted(actual.elapsed) == [1, 2]
+    assert time_index.count(start, end) == 2
+    assert len(time_index) == 7
+
+
+def test_time_index_select_empty_window():
+    time_index = TimeIndex(_time_df())
+
+    assert time_index.select("12:00", "13:00").empty
+    assert time_index.count("12:00", "13:00") == 0
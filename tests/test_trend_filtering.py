@@ -1,10 +1,15 @@
 """Unit tests for trend filtering."""
+import json
 import os
 import shutil
 
+import networkx as nx
+import numpy as np
+import pandas as pd
 import pytest
 
-from trend_filtering import FilterManager, Filter
+from trend_filtering import FilterManager, Filter, validation_statistics, validation_metrics, validation_breakdown, \
+    trend_filter_validate, difference_op
 
 
 @pytest.fixture
@@ -65,3 +70,105 @@ def test_get_remaining_lambdas():
     day_filter.set_lambda_completed(0.1)
 
     assert (day_filter.get_remaining_lambdas() == [0.2]).all()
+
+
+@pytest.fixture
+def validation_data():
+    return pd.DataFrame({
+        "stop_id_post": ["A", "A", "B", "B", "C", "D"],
+        "route_id": ["1", "2", "1", "1", "2", "2"],
+        "stop_distance": [100.0, 200.0, 50.0, 80.0, 120.0, 60.0],
+        "elapsed": [30.0, 70.0, 10.0, 5000.0, 45.0, 20.0],
+    })
+
+
+def test_validation_metrics_match_observation_errors(validation_data):
+    stop_ids = ["C", "A", "B"]
+    congestion = np.array([0.4, 0.3, 0.25])
+
+    statistics = validation_statistics(validation_data, stop_ids)
+    metrics = validation_metrics(statistics, congestion)
+
+    # stop D is not in the training graph and the second observation of B is an outlier
+    val = validation_data[validation_data.stop_id_post.isin(stop_ids) & (validation_data.elapsed < 3600)]
+    fitted = val.stop_id_post.map(dict(zip(stop_ids, congestion)))
+    errors = (fitted * val.stop_distance - val.elapsed) ** 2
+
+    assert metrics["count"] == 4
+    assert metrics["outliers"] == 1
+    assert metrics["sse"] == pytest.approx(errors.sum())
+    assert metrics["mse"] == pytest.approx(errors.mean())
+
+
+def test_validation_breakdown_per_route(validation_data):
+    stop_ids = ["A", "B", "C"]
+    congestion = np.array([0.3, 0.25, 0.4])
+
+    statistics = validation_statistics(validation_data, stop_ids, by=["route_id"])
+    breakdown = validation_breakdown(statistics, congestion, ["route_id"]).set_index("route_id")
+
+    route_1 = [(0.3 * 100 - 30) ** 2, (0.25 * 50 - 10) ** 2]
+    route_2 = [(0.3 * 200 - 70) ** 2, (0.4 * 120 - 45) ** 2]
+
+    assert breakdown.loc["1", "count"] == 2
+    assert breakdown.loc["1", "outliers"] == 1
+    assert breakdown.loc["1", "mse"] == pytest.approx(np.mean(route_1))
+    assert breakdown.loc["2", "mse"] == pytest.approx(np.mean(route_2))
+    assert validation_metrics(statistics, congestion)["sse"] == pytest.approx(sum(route_1) + sum(route_2))
+
+
+def test_validation_statistics_exclude_invalid_observations():
+    val = pd.DataFrame({"stop_id_post": ["A", "A", "A"], "stop_distance": [np.nan, 100.0, 10.0],
+                        "elapsed": [30.0, 40.0, np.nan]})
+
+    statistics = validation_statistics(val, ["A"])
+    metrics = validation_metrics(statistics, np.array([0.5]))
+
+    assert metrics["count"] == 1
+    assert metrics["invalid"] == 2
+    assert metrics["outliers"] == 0
+    assert metrics["mse"] == pytest.approx((0.5 * 100 - 40) ** 2)
+
+
+def test_trend_filter_validate_statistics_match_errors(validation_data):
+    train_graph = nx.path_graph(["A", "B", "C"])
+    time_vec = np.array([0.3, 0.25, 0.4])
+    difference_operator = difference_op(train_graph, 2)
+    day_filter = Filter("day", 0, [0.1], [False], False)
+
+    statistics = validation_statistics(validation_data, list(train_graph.nodes), by=["route_id"])
+    summary = trend_filter_validate(validation_data, time_vec, train_graph, difference_operator, 0.1, day_filter,
+                                    statistics=statistics, breakdown=["stop_id_post", "route_id"])[0.1]
+    errors = trend_filter_validate(validation_data, time_vec, train_graph, difference_operator, 0.1, day_filter)[0.1]
+
+    # both modes leave out the outlier at stop B
+    assert summary["count"] == len(errors) == 4
+    assert summary["mse"] == pytest.approx(np.mean(errors), rel=1e-4)
+    assert [record["route_id"] for record in summary["breakdown"]["route_id"]] == ["1", "2"]
+
+
+def test_trend_filter_validate_breakdown_is_valid_json():
+    val = pd.DataFrame({"stop_id_post": ["A", "B"], "route_id": ["1", "2"], "stop_distance": [100.0, 50.0],
+                        "elapsed": [30.0, 4000.0]})
+    train_graph = nx.path_graph(["A", "B"])
+    day_filter = Filter("day", 0, [1.0], [False], False)
+
+    statistics = validation_statistics(val, list(train_graph.nodes), by=["route_id"])
+    metrics = trend_filter_validate(val, np.array([0.3, 0.2]), train_graph, difference_op(train_graph, 2), 1.0,
+                                    day_filter, statistics=statistics, breakdown=["route_id"])
+
+    route_2 = json.loads(json.dumps(metrics, allow_nan=False))["1.0"]["breakdown"]["route_id"][1]
+
+    assert route_2 == {"route_id": "2", "count": 0, "outliers": 1, "invalid": 0, "sse": 0.0, "mse": None}
+
+
+def test_validation_metrics_do_not_depend_on_breakdown_with_missing_values(validation_data):
+    validation_data.loc[4, "route_id"] = None
+    stop_ids = ["A", "B", "C"]
+    congestion = np.array([0.3, 0.25, 0.4])
+
+    metrics = validation_metrics(validation_statistics(validation_data, stop_ids), congestion)
+    statistics = validation_statistics(validation_data, stop_ids, by=["route_id"])
+
+    assert validation_metrics(statistics, congestion) == pytest.approx(metrics)
+    assert validation_breakdown(statistics, congestion, ["route_id"])["count"].sum() == metrics["count"] == 4
@@ -0,0 +1,92 @@
+"""Unit tests for the validation metric parsing."""
+import json
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from validation import MetricParser, summary_to_mean_error
+
+
+@pytest.fixture
+def cleanup_file_after_test():
+    yield
+    file_path = "tmp/"
+    if os.path.exists(file_path):
+        shutil.rmtree(file_path)
+
+
+def _write_summary(path: str, metrics: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(metrics, file)
+
+
+def test_metric_parser_summary_round_trip(cleanup_file_after_test):
+    path = "tmp/results/val_day_3_lambda_8.json"
+    _write_summary(path, {"8.0": {"count": 4, "outliers": 1, "invalid": 0, "sse": 8.0, "mse": 2.0,
+                                  "breakdown": {"route_id": []}}})
+
+    metric_parser = MetricParser(path)
+    metric_parser.parse()
+    metric_parser.save("tmp/df")
+
+    expected = pd.DataFrame([["day", "3", "8.0", 4, 1, 0, 8.0, 2.0]], columns=MetricParser.summary_columns)
+
+    pd.testing.assert_frame_equal(metric_parser.to_pandas_df(), expected)
+    pd.testing.assert_frame_equal(pd.read_feather("tmp/df/day_3.feather"), expected)
+
+
+def test_summary_to_mean_error_combines_files(cleanup_file_after_test):
+    _write_summary("tmp/results/val_day_3_lambda_8.json",
+                   {"8.0": {"count": 4, "outliers": 1, "invalid": 0, "sse": 8.0, "mse": 2.0}})
+    _write_summary("tmp/results/val_day_3_lambda_16.json",
+                   {"16.0": {"count": 2, "outliers": 0, "invalid": 1, "sse": 10.0, "mse": 5.0}})
+    _write_summary("tmp/results/val_day_3_lambda_8_part.json",
+                   {"8.0": {"count": 6, "outliers": 0, "invalid": 0, "sse": 32.0, "mse": 32.0 / 6}})
+
+    for file_name in sorted(os.listdir("tmp/results")):
+        metric_parser = MetricParser(f"tmp/results/{file_name}")
+        metric_parser.parse()
+        metric_parser.save("tmp/df")
+
+    avg_error = summary_to_mean_error(pd.read_feather("tmp/df/day_3.feather"))
+
+    assert avg_error["lambda"].tolist() == [8.0, 16.0]
+    assert avg_error["avg_error"].tolist() == pytest.approx([40.0 / 10, 5.0])
+
+
+def test_metric_parser_saves_breakdowns(cleanup_file_after_test):
+    path = "tmp/results/val_weather_1_lambda_2.json"
+    route_records = [{"route_id": "64", "count": 3, "outliers": 0, "invalid": 0, "sse": 6.0, "mse": 2.0},
+                     {"route_id": "75", "count": 0, "outliers": 1, "invalid": 0, "sse": 0.0, "mse": None}]
+    _write_summary(path, {"2.0": {"count": 3, "outliers": 1, "invalid": 0, "sse": 6.0, "mse": 2.0,
+                                  "breakdown": {"route_id": route_records}}})
+
+    metric_parser = MetricParser(path)
+    metric_parser.parse()
+    metric_parser.save("tmp/df")
+
+    breakdown = pd.read_feather("tmp/df/breakdown/route_id/weather_1.feather")
+
+    assert breakdown.columns.tolist() == ["name", "value", "lambda", "route_id", "count", "outliers", "invalid", "sse",
+                                          "mse"]
+    assert breakdown.route_id.tolist() == ["64", "75"]
+    assert breakdown.mse.isna().tolist() == [False, True]
+
+
+def test_metric_parser_rejects_mixed_formats(cleanup_file_after_test):
+    _write_summary("tmp/results/val_day_3_lambda_8.json",
+                   {"8.0": {"count": 4, "outliers": 1, "invalid": 0, "sse": 8.0, "mse": 2.0}})
+    _write_summary("tmp/errors/val_day_3_lambda_8.json", {"8.0": [1.0, 4.0]})
+
+    summary_parser = MetricParser("tmp/results/val_day_3_lambda_8.json")
+    summary_parser.parse()
+    summary_parser.save("tmp/df")
+
+    error_parser = MetricParser("tmp/errors/val_day_3_lambda_8.json")
+    error_parser.parse()
+
+    with pytest.raises(ValueError):
+        error_parser.save("tmp/df")
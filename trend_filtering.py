@@ -11,6 +11,8 @@ import numpy as np
 import pandas as pd
 import scipy
 
+from preprocessing import TimeIndex
+
 logger = logging.getLogger()
 
 
@@ -89,7 +91,8 @@ class FilterManager:
 
 
 def vertex_signal(complete_df: pd.DataFrame, routes_graph: nx.Graph, *, weather: Optional[int] = None,
-                  day: Optional[int] = None, time: Optional[tuple[int, int]] = None) -> nx.Graph:
+                  day: Optional[int] = None, time: Optional[tuple[str, str]] = None,
+                  time_index: Optional[TimeIndex] = None) -> nx.Graph:
     """
     Function assigning signal over the public transport graph vertexes by averaging across the inbound edges
     elapsed time, according to a specific filtering option, passed as keyword argument.
@@ -97,7 +100,12 @@ def vertex_signal(complete_df: pd.DataFrame, routes_graph: nx.Graph, *, weather:
     :param routes_graph: The graph, already built.
     :param weather: Main weather conditions, either 0 or 1.
     :param day: The day of the week, as integer in the range [0, 6].
-    :param time: The daytime, as an interval specified by a tuple of two integers.
+    :param time: The daytime, as an interval specified by a tuple of two strings in the format HH:MM, e.g.
+    ("08:00", "09:00"). Both bounds are inclusive and the interval wraps around midnight if the start is after the end,
+    e.g. ("23:00", "00:00").
+    :param time_index: A time index reused across time filters instead of building a new one. It must have been built
+    on the same complete_df, since the observations of a time filter are then taken from the index and complete_df is
+    not used.
     :return: The graph with the signal defined over the vertex set.
     """
     routes_graph = routes_graph.copy()
@@ -106,22 +114,19 @@ def vertex_signal(complete_df: pd.DataFrame, routes_graph: nx.Graph, *, weather:
         raise TypeError(
             'This functions builds the graph according to only one filtering option, you have to pass one and only one.')
     if weather is not None:
-        mask = (complete_df['weather_main_post'] == weather)
+        complete_df = complete_df[complete_df['weather_main_post'] == weather]
     elif day is not None:
-        mask = (complete_df['day_of_week'] == day)
+        complete_df = complete_df[complete_df['day_of_week'] == day]
     else:
-        start_time, end_time = pd.to_datetime(time[0]).time(), pd.to_datetime(time[1]).time()
-        mask = ((complete_df.time_pre_datetime.dt.time >= start_time) & (complete_df.time_pre_datetime.dt.time <= end_time))
+        time_index = time_index if time_index is not None else TimeIndex(complete_df)
+        complete_df = time_index.select(time[0], time[1])
 
-    complete_df = complete_df[mask]
     if not len(complete_df):
         raise (ValueError('The filtering option you passed is wrong since no observation has matching fields.'))
 
-    pd.options.mode.chained_assignment = None
-    complete_df['elapsed'] /= complete_df['stop_distance']
-    pd.options.mode.chained_assignment = 'warn'
-
-    complete_df = complete_df[['elapsed', 'stop_id_post']].groupby('stop_id_post').mean()
+    # the time index returns slices of its own dataframe, so we do not modify the selected observations in place
+    elapsed = complete_df['elapsed'] / complete_df['stop_distance']
+    complete_df = elapsed.groupby(complete_df['stop_id_post']).mean().to_frame('elapsed')
     nx.set_node_attributes(routes_graph, complete_df.to_dict('index'))
 
     delete_vx = [x[0] for x in routes_graph.nodes('elapsed') if x[1] is None]
@@ -150,17 +155,131 @@ def difference_op(graph: nx.Graph, order: int) -> scipy.sparse.csr_array:
     return out
 
 
+MAX_VALIDATION_ELAPSED = 3600
+
+STATISTICS_COLUMNS = ['count', 'elapsed', 'elapsed_sq', 'distance_elapsed', 'distance_sq', 'outliers', 'invalid']
+
+
+def _excluded_observations(val: pd.DataFrame, max_elapsed: float) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the masks of the outliers and of the observations with a missing elapsed time or stop distance."""
+    elapsed = val['elapsed'].to_numpy(dtype=float)
+    invalid = ~(np.isfinite(elapsed) & np.isfinite(val['stop_distance'].to_numpy(dtype=float)))
+    outlier = ~invalid & (np.nan_to_num(elapsed) >= max_elapsed)
+
+    return outlier, invalid
+
+
+def validation_statistics(val: pd.DataFrame, stop_ids: List, *, by: Optional[List[str]] = None,
+                          max_elapsed: float = MAX_VALIDATION_ELAPSED) -> pd.DataFrame:
+    """Computes the sufficient statistics of the squared validation error for every stop.
+
+    The squared error of an observation is (c * distance - elapsed)^2 where c is the congestion of its stop, so the sum
+    of errors at a stop only depends on the number of observations and the sums of elapsed^2, distance * elapsed, and
+    distance^2. These are computed once per filter, the error of any fitted vector then takes a few dot products.
+    Observations with an elapsed time of at least max_elapsed are outliers, they are counted but not included in the
+    sums. The same goes for invalid observations, which have a missing elapsed time or stop distance.
+
+    :arg
+        val (pd.DataFrame): the validation data.
+        stop_ids (List): the stops in the order of the fitted vector, i.e. the nodes of the training graph.
+        Observations at other stops are dropped.
+        by (List[str]): optional columns, e.g. ["route_id"], to keep in the statistics for breakdowns.
+        max_elapsed (float): the elapsed time in seconds from which an observation is an outlier.
+
+    :return
+        (pd.DataFrame) a dataframe with a row per stop (and by columns) with the position of the stop in stop_ids in
+        the node column and the statistics in the count, elapsed, elapsed_sq, distance_elapsed, distance_sq, outliers,
+        and invalid columns.
+    """
+    keys = ['stop_id_post'] + [column for column in by or [] if column != 'stop_id_post']
+    outlier, invalid = _excluded_observations(val, max_elapsed)
+    included = ~(outlier | invalid)
+    elapsed = np.where(included, val['elapsed'].to_numpy(dtype=float), 0)
+    distance = np.where(included, val['stop_distance'].to_numpy(dtype=float), 0)
+
+    terms = pd.DataFrame({
+        'count': included.astype(int),
+        'elapsed': elapsed,
+        'elapsed_sq': elapsed ** 2,
+        'distance_elapsed': distance * elapsed,
+        'distance_sq': distance ** 2,
+        'outliers': outlier.astype(int),
+        'invalid': invalid.astype(int),
+    }, index=val.index)
+    # rows with a missing by column are kept, otherwise asking for a breakdown would change the overall metrics
+    statistics = terms.groupby([val[key] for key in keys], dropna=False).sum().reset_index()
+
+    statistics['node'] = pd.Index(stop_ids).get_indexer(statistics['stop_id_post'])
+    statistics = statistics[statistics['node'] >= 0].reset_index(drop=True)
+
+    return statistics[keys + ['node'] + STATISTICS_COLUMNS]
+
+
+def _squared_errors(statistics: pd.DataFrame, congestion: np.ndarray) -> np.ndarray:
+    """Returns the sum of squared errors of every row in the statistics for a fitted vector."""
+    c = np.asarray(congestion, dtype=float)[statistics['node'].to_numpy()]
+    errors = (c ** 2 * statistics['distance_sq'].to_numpy() - 2 * c * statistics['distance_elapsed'].to_numpy()
+              + statistics['elapsed_sq'].to_numpy())
+
+    # cancellation can leave tiny negative values where the fit is almost exact
+    return np.maximum(errors, 0)
+
+
+def validation_metrics(statistics: pd.DataFrame, congestion: np.ndarray) -> Dict[str, float]:
+    """Computes the validation metrics of a fitted vector from the sufficient statistics.
+
+    :arg
+        statistics (pd.DataFrame): the statistics, as returned by validation_statistics.
+        congestion (np.ndarray): the fitted congestion, in the order of the stops used for the statistics.
+
+    :return
+        (dict) a dictionary with the number of observations, outliers, invalid observations, the sum of squared errors,
+        and the mean squared error, which is None without observations.
+    """
+    count = int(statistics['count'].sum())
+    sse = float(_squared_errors(statistics, congestion).sum())
+
+    return {'count': count, 'outliers': int(statistics['outliers'].sum()), 'invalid': int(statistics['invalid'].sum()),
+            'sse': sse, 'mse': sse / count if count else None}
+
+
+def validation_breakdown(statistics: pd.DataFrame, congestion: np.ndarray, by: List[str]) -> pd.DataFrame:
+    """Computes the validation metrics of a fitted vector per group, e.g. per stop or per route.
+
+    :arg
+        statistics (pd.DataFrame): the statistics, as returned by validation_statistics with the by columns.
+        congestion (np.ndarray): the fitted congestion, in the order of the stops used for the statistics.
+        by (List[str]): the columns to group by, e.g. ["stop_id_post"] or ["route_id"].
+
+    :return
+        (pd.DataFrame) a dataframe with the count, outliers, invalid, sse, and mse columns per group. The mse is NaN for
+        groups without observations.
+    """
+    errors = statistics[by + ['count', 'outliers', 'invalid']].assign(sse=_squared_errors(statistics, congestion))
+    breakdown = errors.groupby(by, dropna=False).sum().reset_index()
+    breakdown['mse'] = breakdown['sse'] / breakdown['count'].where(breakdown['count'] > 0)
+
+    return breakdown
+
+
 def trend_filter_validate(val: pd.DataFrame, time_vec: np.ndarray, train_graph: nx.Graph, difference_operator, value_lambda: float,
-                          cond_filter: Filter) -> Dict[float, np.ndarray]:
+                          cond_filter: Filter, statistics: Optional[pd.DataFrame] = None,
+                          breakdown: Optional[List[str]] = None,
+                          max_elapsed: float = MAX_VALIDATION_ELAPSED) -> Dict[float, Union[np.ndarray, Dict]]:
     """Runs a validation using trend filtering on a given train-test split.
 
     :arg
-        train (pd.DataFrame): the training data.
         val (pd.DataFrame): the validation data.
-        routes_graph (nx.Graph): the networkx graph of bus routes.
-        lambda_seq (tuple[float, ...]): the sequence of lambda values to try.
+        time_vec (np.ndarray): the signal on the nodes of the training graph.
+        train_graph (nx.Graph): the networkx graph of bus routes with the signal, built on the training data.
+        difference_operator: the difference operator of the training graph.
+        value_lambda (float): the lambda value to try.
         cond_filter (Filter): the filter used to select validation data. An instance of the Filter dataclass.
-        filter_manager (FilterManager): the filter manager that holds the cond_filter object.
+        statistics (pd.DataFrame): the validation statistics, as returned by validation_statistics. If given, the
+        metrics are computed from the statistics instead of returning the error of every validation observation.
+        breakdown (List[str]): optional columns of the statistics, the metrics are also broken down by each of them.
+        max_elapsed (float): the elapsed time in seconds from which an observation is an outlier. Outliers and invalid
+        observations are left out of the errors, like they are left out of the statistics.
     :return
         (dict) a dictionary with validation metrics.
     """
@@ -176,10 +295,23 @@ def trend_filter_validate(val: pd.DataFrame, time_vec: np.ndarray, train_graph:
         problem.solve(solver=cp.CVXOPT, verbose=True, warm_start=True)
     except Exception as e:
         logger.error(f"Exception while solving.", exc_info=e)
+
+    if statistics is not None:
+        metrics = validation_metrics(statistics, x.value)
+        if breakdown:
+            metrics['breakdown'] = {}
+            for column in breakdown:
+                records = validation_breakdown(statistics, x.value, [column])
+                # NaN is not valid JSON, so groups without observations get a null mse
+                metrics['breakdown'][column] = records.astype(object).where(records.notna(), None).to_dict('records')
+        metric_dict[float(value_lambda)] = metrics
+        return metric_dict
+
     congestion_df = pd.DataFrame(zip(train_graph.nodes, x.value), columns=['stop_id_post', 'congestion'])
 
     # Compute validation metric for specific lambda
-    val_congestion = val.merge(congestion_df, on='stop_id_post')
+    outlier, invalid = _excluded_observations(val, max_elapsed)
+    val_congestion = val[~(outlier | invalid)].merge(congestion_df, on='stop_id_post')
     error = (val_congestion['congestion'] * val_congestion['stop_distance'] - val_congestion['elapsed']).to_numpy() **2
     metric_dict[float(value_lambda)] = error.tolist()
 
@@ -9,8 +9,8 @@ import numpy as np
 import pandas as pd
 import requests
 
-from preprocessing import build_route_stops, build_stop_graph
-from trend_filtering import trend_filter_validate, FilterManager, vertex_signal, difference_op
+from preprocessing import build_route_stops, build_stop_graph, TimeIndex
+from trend_filtering import trend_filter_validate, FilterManager, vertex_signal, difference_op, validation_statistics
 
 log_dir = "logs"
 Path(log_dir).mkdir(parents=True, exist_ok=True)
@@ -47,9 +47,15 @@ if __name__ == "__main__":
     # Create an argument parser with arguments
     parser = argparse.ArgumentParser(description='Run the trend filtering validation.')
     parser.add_argument('-f', '--filter', type=str, help="Path to a .json file with the filters for which to run the validation.")
+    parser.add_argument('-e', '--errors', action='store_true', help="Save the error of every validation observation "
+                                                                    "instead of the summary metrics.")
+    parser.add_argument('-b', '--breakdown', type=str, nargs='*', choices=['stop', 'route'], default=[],
+                        help="Add the summary metrics per stop and/or per route.")
 
     # Parse the arguments
     args = parser.parse_args()
+    if args.errors and args.breakdown:
+        parser.error("--breakdown is only available for the summary metrics, not with --errors.")
 
     lambda_seq = (1, 2, 8, 16, 32)
     filter_manager = FilterManager(args.filter, lambdas=lambda_seq)
@@ -90,9 +96,18 @@ if __name__ == "__main__":
     train_data = trip_live[~val_mask]
     val_data = trip_live[val_mask]
 
+    # the time indexes keep a sorted copy of the data, so we only build them if there are time filters
+    train_time_index, val_time_index = None, None
+    if any(trend_filter.name == 'time' for trend_filter in uncompleted_filters):
+        logger.info("Building time indexes.")
+        train_time_index = TimeIndex(train_data)
+        val_time_index = TimeIndex(val_data)
+
     lambda_seq = (1, 2, 8, 16, 32)
     logger.info(f"Using lambda values: {lambda_seq}")
 
+    breakdown_columns = [{'stop': 'stop_id_post', 'route': 'route_id'}[breakdown] for breakdown in args.breakdown]
+
     validation_dir = "validation_results"
     logger.info(f"Creating directory {validation_dir} for validation results.")
     Path(validation_dir).mkdir(parents=True, exist_ok=True)
@@ -103,7 +118,7 @@ if __name__ == "__main__":
 
         logger.info("Building graph with signals.")
         # Building the unfiltered graph on training data
-        train_graph = vertex_signal(train_data, init_graph, **cond_filter_dict)
+        train_graph = vertex_signal(train_data, init_graph, **cond_filter_dict, time_index=train_time_index)
 
         logger.info("Building difference operator.")
         difference_operator = difference_op(train_graph, 2)
@@ -113,20 +128,24 @@ if __name__ == "__main__":
         logger.info("Filtering validation set.")
         # Filtering the validation data
         if trend_filter.name == 'weather':
-            mask = (val_data['weather_main_post'] == trend_filter.value)
+            val = val_data[val_data['weather_main_post'] == trend_filter.value]
         elif trend_filter.name == 'day':
-            mask = (val_data['day_of_week'] == trend_filter.value)
+            val = val_data[val_data['day_of_week'] == trend_filter.value]
         elif trend_filter.name == 'time':
-            time = trend_filter.value
-            start_time, end_time = pd.to_datetime(time[0]).time(), pd.to_datetime(time[1]).time()
-            mask = ((val_data.time_pre_datetime.dt.time >= start_time) & (val_data.time_pre_datetime.dt.time <= end_time))
+            start_time, end_time = trend_filter.value
+            val = val_time_index.select(start_time, end_time)
         else:
             raise ValueError('Illegal filtering option.')
-        val = val_data[mask]
+
+        statistics = None
+        if not args.errors:
+            logger.info("Computing validation statistics.")
+            statistics = validation_statistics(val, list(train_graph.nodes), by=breakdown_columns)
 
         for value_lambda in trend_filter.get_remaining_lambdas():
             logger.info(f"Running trend filter validation with filter: {trend_filter} and lambda value: {value_lambda}")
-            metrics = trend_filter_validate(val_data, time_vec, init_graph, difference_operator, value_lambda, trend_filter)
+            metrics = trend_filter_validate(val, time_vec, train_graph, difference_operator, value_lambda, trend_filter,
+                                            statistics=statistics, breakdown=breakdown_columns)
 
             metrics_file = f"{validation_dir}/val_{trend_filter.file_name().replace(':', '_')}_lambda_{value_lambda}.json"
             logger.info(f"Saving validation metrics to {metrics_file}")
@@ -1,2 +1,2 @@
-from .parse import MetricParser, to_mean_error
+from .parse import MetricParser, to_mean_error, summary_to_mean_error
 from .plot import plot_avg_error
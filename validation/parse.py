@@ -14,9 +14,11 @@ class MetricParser:
     """Class for parsing a metric dictionary."""
 
     columns = ["name", "value", "lambda", "error"]
+    summary_columns = ["name", "value", "lambda", "count", "outliers", "invalid", "sse", "mse"]
 
     def __init__(self, path: str):
         self.metrics = None
+        self.breakdowns = {}
         self.path = path
         file_name = self.path.split("/")[-1]
 
@@ -32,7 +34,10 @@ class MetricParser:
             self.value = f"{start}-{end}"
 
     def parse(self):
-        """Parses the metric file."""
+        """Parses the metric file, either with the error of every observation or with the summary metrics.
+
+        The breakdowns of summary metrics, e.g. per route, are parsed into a dataframe per breakdown column.
+        """
         logger.info(f"Parsing metrics from: {self.path}")
         name_column = []
         value_column = []
@@ -42,6 +47,19 @@ class MetricParser:
         with open(self.path, "r") as file:
             data = json.load(file)
 
+        if all(isinstance(metrics, dict) for metrics in data.values()):
+            self.metrics = pd.DataFrame(
+                [[self.name, self.value, lambda_value] + [metrics.get(column) for column in self.summary_columns[3:]]
+                 for lambda_value, metrics in data.items()], columns=self.summary_columns)
+
+            breakdown_rows = {}
+            for lambda_value, metrics in data.items():
+                for column, records in metrics.get("breakdown", {}).items():
+                    breakdown_rows.setdefault(column, []).extend(
+                        {"name": self.name, "value": self.value, "lambda": lambda_value, **record} for record in records)
+            self.breakdowns = {column: pd.DataFrame(rows) for column, rows in breakdown_rows.items() if rows}
+            return
+
         for lambda_value, errors in data.items():
             n_rows = len(errors)
             name_column += [self.name] * n_rows
@@ -60,18 +78,32 @@ class MetricParser:
         return self.metrics.to_numpy()
 
     def save(self, directory: str):
+        """Saves the metrics, appending them to the metrics of the same filter if they exist.
+
+        Breakdowns are saved in a breakdown/<column> subdirectory, e.g. breakdown/route_id/day_0.feather.
+        """
         logger.info(f"Saving metrics at {directory}")
         file_name = f"{self.name}_{self.value}.feather"
-        file_path = f"{directory}/{file_name}"
 
-        Path(directory).mkdir(parents=True, exist_ok=True)
+        _append_feather(self.metrics, f"{directory}/{file_name}")
+
+        for column, breakdown in self.breakdowns.items():
+            _append_feather(breakdown, f"{directory}/breakdown/{column}/{file_name}")
+
 
-        if os.path.exists(file_path):
-            df = pd.read_feather(file_path)
-            concat_df = pd.concat([self.metrics, df], ignore_index=True)
-            concat_df.to_feather(file_path)
-        else:
-            self.metrics.to_feather(file_path)
+def _append_feather(data: pd.DataFrame, file_path: str):
+    """Saves a dataframe to a feather file, concatenated with the dataframe already saved there, if any."""
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+
+    if os.path.exists(file_path):
+        df = pd.read_feather(file_path)
+        if list(df.columns) != list(data.columns):
+            raise ValueError(f"Cannot append metrics with columns {list(data.columns)} to {file_path} with columns "
+                             f"{list(df.columns)}, error and summary metrics must be saved in different directories.")
+        concat_df = pd.concat([data, df], ignore_index=True)
+        concat_df.to_feather(file_path)
+    else:
+        data.to_feather(file_path)
 
 
 def to_mean_error(data: pd.DataFrame) -> pd.DataFrame:
@@ -97,3 +129,24 @@ def to_mean_error(data: pd.DataFrame) -> pd.DataFrame:
     means_df["avg_error"] = means_df["avg_error"].astype(float)
     means_df = means_df.sort_values("lambda", ascending=True)
     return means_df
+
+
+def summary_to_mean_error(data: pd.DataFrame) -> pd.DataFrame:
+    """Turns a summary metric dataframe with columns: name, value, lambda, count, outliers, invalid, sse, mse into a
+    dataframe with mean error per lambda.
+
+    :arg
+        data (pd.DataFrame): a dataframe with summary metrics for a specific filter.
+
+    :return
+        (pd.DataFrame): a pandas dataframe with the average error per filter and lambda.
+    """
+    sums = data.groupby(["name", "value", "lambda"])[["sse", "count"]].sum().reset_index()
+    sums["avg_error"] = sums["sse"] / sums["count"]
+
+    means_df = sums.drop(columns=["sse", "count"])
+    means_df.index = range(0, len(means_df))
+    means_df["lambda"] = means_df["lambda"].astype(float)
+    means_df["avg_error"] = means_df["avg_error"].astype(float)
+    means_df = means_df.sort_values("lambda", ascending=True)
+    return means_df
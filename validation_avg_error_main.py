@@ -4,9 +4,10 @@ import logging.config
 import os
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from validation import MetricParser, to_mean_error
+from validation import MetricParser, to_mean_error, summary_to_mean_error
 
 log_dir = "logs"
 Path(log_dir).mkdir(parents=True, exist_ok=True)
@@ -17,6 +18,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Concatenate all validation metric dataframes into a single dataframe with average errors.')
     parser.add_argument('-d', '--directory', type=str, required=True, help="The directory where the validation metric "
                                                                            "feather dataframes can be found.")
+    parser.add_argument('-m', '--max-error', type=float, default=3600**2,
+                        help="Drop per-observation errors of at least this value, 3600^2 by default. Use inf to keep "
+                             "all errors. Summary metrics are not affected.")
 
     # Parse the arguments
     args = parser.parse_args()
@@ -26,15 +30,22 @@ if __name__ == "__main__":
     output_dir = "data/validation"
 
     for file_name in os.listdir(args.directory):
+        # the breakdown/ subdirectory holds per stop and per route metrics, which are not averaged here
+        if not file_name.endswith(".feather"):
+            continue
+
         file_path = f"{args.directory}/{file_name}"
         logger.info(f"Reading dataframe from {file_path}")
         df = pd.read_feather(file_path)
 
-        # ignore all errors that are more than 1 hour since they are crazy outliers
-        df = df[df.error < 3600**2]
-
         logger.info(f"Extracting mean error.")
-        df = to_mean_error(df)
+        if "error" in df.columns:
+            # ignore all errors that are more than 1 hour since they are crazy outliers
+            logger.info(f"Dropping errors that are not finite or at least {args.max_error}.")
+            df = df[np.isfinite(df.error.astype(float)) & (df.error < args.max_error)]
+            df = to_mean_error(df)
+        else:
+            df = summary_to_mean_error(df)
 
         dfs.append(df)
 